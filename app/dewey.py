@@ -1,6 +1,6 @@
-from openai import AzureOpenAI
-from typing import List, Any
-from azure.search.documents import SearchClient
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
+from typing import List, Any, AsyncIterator, Optional
+from azure.search.documents.aio import SearchClient
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents.models import (
     VectorizedQuery,
@@ -11,18 +11,133 @@ from datetime import datetime
 from dateutil.parser import parse
 from models import DateRange, AzureSearchConfig, AzureOpenAIConfig
 from tools import load_search_tool, load_search_prompt, load_answer_prompt
-import json
+import asyncio
+import httpx
+import io
+import orjson
 import re
 from tips import TipFormatter
 from contextlib import contextmanager
+from collections import OrderedDict
+
+# Flattens article content onto a single line in one pass
+_NEWLINES_TO_SPACES = str.maketrans({"\n": " ", "\r": " "})
+
+# Publish timestamps already converted to dates, evicted oldest first
+_PUBLISH_DATE_CACHE_SIZE = 4096
+_publish_dates = {}
+
+
+def _publish_date(value: str) -> str:
+    """
+    Convert an index timestamp to an ISO date, skipping dateutil for ISO 8601 input.
+    """
+    if (cached := _publish_dates.get(value)) is not None:
+        return cached
+
+    try:
+        date = datetime.fromisoformat(value).date().isoformat()
+    except ValueError:
+        date = parse(value).date().isoformat()
+
+    if len(_publish_dates) >= _PUBLISH_DATE_CACHE_SIZE:
+        del _publish_dates[next(iter(_publish_dates))]
+    _publish_dates[value] = date
+    return date
+
+
+class _StepYielder:
+    """
+    Updates one step of a `Dewey.process` call. Without a step, e.g. when steps
+    are hidden, nothing is recorded and there is nothing to yield.
+    """
+    __slots__ = ("step", "steps_list", "has_started")
+
+    def __init__(self, step, steps_list):
+        self.step = step
+        self.steps_list = steps_list
+        self.has_started = False
+    
+    def start(self, content=""):
+        if self.step is not None and not self.has_started:
+            if content:
+                self.step["content"] = content
+            self.has_started = True
+            return "", self.steps_list.copy()
+        return None
+    
+    def complete(self, content=""):
+        if self.step is None:
+            return None
+        self.step["status"] = "done"
+        if content:
+            self.step["content"] = content
+        return "", self.steps_list.copy()
+
+
+class _SharedSearch:
+    """
+    One search read by several callers. Every caller is handed each article as
+    soon as it is read, including callers that join after reading has started.
+    """
+    __slots__ = ("sources", "task", "_read")
+
+    def __init__(self, sources: AsyncIterator[dict]):
+        self.sources = []
+        self._read = asyncio.Event()
+        self.task = asyncio.create_task(self._collect(sources))
+        self.task.add_done_callback(lambda _: self._notify())
+
+    async def _collect(self, sources: AsyncIterator[dict]):
+        async for source in sources:
+            self.sources.append(source)
+            self._notify()
+
+    def _notify(self):
+        # Wake the waiting readers, later waits use a fresh event
+        self._read.set()
+        self._read = asyncio.Event()
+
+    async def read(self) -> AsyncIterator[dict]:
+        # A cancelled reader only stops waiting, the search goes on for the others
+        position = 0
+        while True:
+            if position < len(self.sources):
+                yield self.sources[position]
+                position += 1
+            elif self.task.done():
+                # Raises the search error, if any
+                self.task.result()
+                return
+            else:
+                await self._read.wait()
+
 
 class Dewey:
+    # Maximum number of query embeddings kept in memory
+    EMBEDDING_CACHE_SIZE = 1024
+    # Maximum number of inputs Azure OpenAI accepts per embedding request
+    EMBEDDING_BATCH_SIZE = 16
+
+    # Completed "question" value in the streamed search tool arguments
+    _QUESTION_ARG_RE = re.compile(r'"question"\s*:\s*("(?:[^"\\]|\\.)*")')
+    # Source citations emitted by the answer model, e.g. [SRC1]
+    _CITE_RE = re.compile(r'\[SRC(\d+)\]')
+    # Unfinished citation at the end of the streamed text, e.g. "[SR" or "[SRC1"
+    _CITE_PREFIX_RE = re.compile(r'\[(?:S(?:R(?:C\d*)?)?)?$')
+
     def __init__(self, openai_config: AzureOpenAIConfig, search_config: AzureSearchConfig):
-        # Initialize client connections
-        self.oai_client = AzureOpenAI(
+        # Initialize client connections, keeping a pool of HTTP/2 connections
+        # to Azure OpenAI open across the metadata, embedding and answer calls
+        self.oai_client = AsyncAzureOpenAI(
             api_key=openai_config.api_key,
             azure_endpoint=openai_config.endpoint,
-            api_version="2025-03-01-preview"
+            api_version="2025-03-01-preview",
+            # Keeps the SDK's own client defaults, e.g. timeouts and redirects
+            http_client=DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            )
         )
         self.search_client = SearchClient(
             search_config.service_endpoint,
@@ -32,57 +147,57 @@ class Dewey:
 
         # Store config for deployment names
         self.openai_config = openai_config
+        self.vector_k = search_config.vector_k
         self.sessions = {}
         self.tip_formatter = TipFormatter
 
+        # The search tool schema never changes, so build it once
+        self.search_tool = load_search_tool()
+
+        # LRU of embedding tasks keyed by (deployment, normalized question)
+        self._embedding_cache = OrderedDict()
+
+        # Searches in flight keyed by normalized questions and filter
+        self._inflight_searches = {}
+
     @contextmanager
-    def step(self, title, show_steps=True):
+    def step(self, title, steps: List[dict], show_steps=True):
         if not show_steps:
-            yield lambda: None
+            yield _StepYielder(None, steps)
             return
             
         step = {"title": title, "status": "pending"}
-        if not hasattr(self, '_current_steps'):
-            self._current_steps = []
-        
-        self._current_steps.append(step)
-        
-        class StepYielder:
-            def __init__(self, step, steps_list):
-                self.step = step
-                self.steps_list = steps_list
-                self.has_started = False
-            
-            def start(self, content=""):
-                if not self.has_started:
-                    if content:
-                        self.step["content"] = content
-                    self.has_started = True
-                    return "", self.steps_list.copy()
-                return None
-            
-            def complete(self, content=""):
-                self.step["status"] = "done"
-                if content:
-                    self.step["content"] = content
-                return "", self.steps_list.copy()
+        steps.append(step)
         
-        yielder = StepYielder(step, self._current_steps)
+        yielder = _StepYielder(step, steps)
         try:
             yield yielder
         finally:
             step["status"] = "done"
 
-    def generate_metadata(self, messages, current_date: str):
-        response = self.oai_client.responses.create(
+    async def generate_metadata(self, messages, current_date: str):
+        response = await self.oai_client.responses.create(
             model=self.openai_config.chat_deployment,
             input=messages,
             instructions=load_search_prompt(current_date),
-            tools=[load_search_tool()],
+            tools=[self.search_tool],
             tool_choice={"type": "function", "name": "search_archive"},
+            stream=True
         )
 
-        return json.loads(response.output[-1].arguments)
+        arguments = ""
+        prefetched = False
+        async for chunk in response:
+            if chunk.type == "response.function_call_arguments.delta":
+                arguments += chunk.delta
+                # Embed the question while the rest of the arguments are generated
+                if not prefetched and (match := self._QUESTION_ARG_RE.search(arguments)):
+                    self.prefetch_embeddings([orjson.loads(match.group(1))])
+                    prefetched = True
+            elif chunk.type == "response.function_call_arguments.done":
+                arguments = chunk.arguments
+
+        return orjson.loads(arguments)
     
     def build_filter(self, metadata):
         filters = []
@@ -106,26 +221,83 @@ class Dewey:
             filters.append(f"{author_filter_text}")
 
         return None if len(filters) == 0 else " and ".join(filters)
-    
-    def retrieve_articles(self, metadata):
-        # Prepare vector query
-        vectors: List[VectorQuery] = []
 
-        embedding = self.oai_client.embeddings.create(
+    async def _create_embeddings(self, questions: List[str]) -> List[List[float]]:
+        response = await self.oai_client.embeddings.create(
             model=self.openai_config.embedding_deployment,
-            input=metadata["question"],
+            input=questions,
+            # Must match the size of the index vectors, shortened or not
+            dimensions=self.openai_config.embedding_dimensions,
         )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
 
-        query_vector = VectorizedQuery(vector=embedding.data[0].embedding, k_nearest_neighbors=50, fields="content_vector")
+    def _cache_embedding(self, key, task: asyncio.Task):
+        self._embedding_cache[key] = task
+        if len(self._embedding_cache) > self.EMBEDDING_CACHE_SIZE:
+            self._embedding_cache.popitem(last=False)
 
-        vectors.append(query_vector)
+        # Failed requests must not be served from the cache
+        def evict_failed(done):
+            if (done.cancelled() or done.exception()) and self._embedding_cache.get(key) is done:
+                del self._embedding_cache[key]
+        task.add_done_callback(evict_failed)
 
-        # Build filter
-        filter = self.build_filter(metadata)
-        print(filter)
+    @staticmethod
+    async def _select_embedding(batch_task: asyncio.Task, i: int) -> List[float]:
+        return (await batch_task)[i]
+
+    def prefetch_embeddings(self, questions: List[str]) -> List[asyncio.Task]:
+        """
+        Schedule embeddings for several questions and return one task per question,
+        reusing cached results and requests already in flight.
+        Uncached questions are sent together, EMBEDDING_BATCH_SIZE inputs per request.
+        """
+        keys = [(self.openai_config.embedding_deployment, question.strip().lower()) for question in questions]
+
+        tasks = {}
+        missing = {}
+        for question, key in zip(questions, keys):
+            if key in tasks or key in missing:
+                continue
+            if (task := self._embedding_cache.get(key)) is not None:
+                self._embedding_cache.move_to_end(key)
+                tasks[key] = task
+            else:
+                missing[key] = question
+
+        missing_items = list(missing.items())
+        for start in range(0, len(missing_items), self.EMBEDDING_BATCH_SIZE):
+            batch = missing_items[start:start + self.EMBEDDING_BATCH_SIZE]
+            batch_task = asyncio.create_task(self._create_embeddings([question for _, question in batch]))
+            for i, (key, _) in enumerate(batch):
+                tasks[key] = asyncio.create_task(self._select_embedding(batch_task, i))
+                self._cache_embedding(key, tasks[key])
+
+        return [tasks[key] for key in keys]
+
+    async def embed_many(self, questions: List[str]) -> List[List[float]]:
+        """
+        Embed several questions, see `prefetch_embeddings`.
+        """
+        tasks = self.prefetch_embeddings(questions)
+        # Shield the shared tasks so one cancelled caller does not cancel them for the others
+        return list(await asyncio.gather(*(asyncio.shield(task) for task in tasks)))
+
+    async def embed(self, question: str) -> List[float]:
+        """
+        Embed a single question, see `embed_many`.
+        """
+        return (await self.embed_many([question]))[0]
+    
+    async def _search(self, metadata, questions: List[str], filter: Optional[str]) -> AsyncIterator[dict]:
+        # Prepare vector queries
+        vectors: List[VectorQuery] = [
+            VectorizedQuery(vector=embedding, k_nearest_neighbors=self.vector_k, fields="content_vector")
+            for embedding in await self.embed_many(questions)
+        ]
         
         # Perform search
-        results = self.search_client.search(
+        results = await self.search_client.search(
             search_text=metadata["question"],
             filter=filter,
             top=10,
@@ -136,22 +308,50 @@ class Dewey:
             select=["url", "headline", "publish_date", "content", "authors"]
         )
 
-        sources = []
-
-        for page in results:
-            sources.append(json.dumps({
+        async for page in results:
+            yield {
                 "url": page["url"],
-                "publish_date": f"{parse(page['publish_date']).date().isoformat()}",
+                "publish_date": _publish_date(page["publish_date"]),
                 "authors": page["authors"],
                 "headline": page["headline"],
-                "content":  page["content"].replace("\n", " ").replace("\r", " ")
-            }))
+                "content": page["content"].translate(_NEWLINES_TO_SPACES)
+            }
 
-        return sources
+    async def search_articles(self, metadata, questions: Optional[List[str]] = None) -> AsyncIterator[dict]:
+        """
+        Search the archive and yield each article as soon as it is read from the results.
+        Identical searches already in flight, e.g. from other sessions, share one request.
+        """
+        # Every question gets its own vector query, embedded in as few requests as possible
+        questions = questions or [metadata["question"]]
 
-    def process(self, message: str, history: List, show_steps: bool=True):
-        # Reset steps
-        self._current_steps = []
+        # Build filter
+        filter = self.build_filter(metadata)
+        print(filter)
+
+        key = (
+            metadata["question"].strip().lower(),
+            tuple(question.strip().lower() for question in questions),
+            filter,
+        )
+        search = self._inflight_searches.get(key)
+        if search is None:
+            search = _SharedSearch(self._search(metadata, questions, filter))
+            self._inflight_searches[key] = search
+
+            def release(done):
+                del self._inflight_searches[key]
+                # Consume the error in case every caller has gone away
+                if not done.cancelled():
+                    done.exception()
+            search.task.add_done_callback(release)
+
+        async for source in search.read():
+            yield source
+
+    async def process(self, message: str, history: List, show_steps: bool=True):
+        # Steps belong to this call so concurrent sessions don't share them
+        steps = []
 
         # Grab the current day
         date_today = datetime.now()
@@ -165,49 +365,67 @@ class Dewey:
         })
         
         # Step 1: Generate metadata
-        with self.step("Generating metadata", show_steps) as step:
+        with self.step("Generating metadata", steps, show_steps) as step:
             if result := step.start("🔍 I'm planning my approach."):
                 yield result
-            metadata = self.generate_metadata(messages, formatted_date_today)
+            metadata = await self.generate_metadata(messages, formatted_date_today)
             metadata_tip = self.tip_formatter.tip_metadata(metadata)
             if result := step.complete(metadata_tip):
                 yield result
         
         # Step 2: Search articles  
-        with self.step("Searching articles", show_steps) as step:
+        with self.step("Searching articles", steps, show_steps) as step:
             if result := step.start("🔍 Digging through the archives"):
                 yield result
-            sources = self.retrieve_articles(metadata)
+            sources = []
+            prompt_sources = []
+            # Citation number -> URL, citations are 1-based
+            source_urls = {}
+            async for source in self.search_articles(metadata):
+                sources.append(source)
+                source_urls[len(sources)] = source["url"]
+                # Serialize each source for the prompt while the remaining results are read
+                prompt_sources.append(orjson.dumps(source).decode())
             sources_tip = self.tip_formatter.tip_search(sources)
             if result := step.complete(sources_tip):
                 yield result
 
         # Step 3: Generate final response with sources
-        stacked_sources = '\n\n'.join(sources)
+        stacked_sources = '\n\n'.join(prompt_sources)
         messages.append({"role": "user", "content": f"{message}\n\n## Sources\n{stacked_sources}"})
-
-        # Create source URL lookup from sources list
-        source_urls = {}
-        for i, source_json in enumerate(sources, 1):
-            source_data = json.loads(source_json)
-            source_urls[i] = source_data["url"]
         
-        response = self.oai_client.responses.create(
+        response = await self.oai_client.responses.create(
             model=self.openai_config.chat_deployment,
             instructions=load_answer_prompt(formatted_date_today),
             input=messages,
             stream=True
         )
 
-        partial = ""
-        for chunk in response:
+        # Citations are rewritten incrementally: only text after the last
+        # complete citation (or a possible partial one) is rescanned, and
+        # rewritten text is appended to a buffer instead of a growing string.
+        linked = io.StringIO()
+        pending = ""
+        async for chunk in response:
             if chunk.type == "response.output_text.delta":
                 if delta := chunk.delta:
-                    partial += delta
-                    # Replace citation patterns with hyperlinks
-                    processed_partial = re.sub(
-                        r'\[SRC(\d+)\]',
-                        lambda m: f"[[{m.group(1)}]]({source_urls.get(int(m.group(1)), '#')})",
-                        partial
-                    )
-                    yield processed_partial, self._current_steps.copy()
+                    pending += delta
+                    if "[" not in pending:
+                        # No citation can start here, skip the regex scans
+                        linked.write(pending)
+                        pending = ""
+                    else:
+                        position = 0
+                        # Replace citation patterns with hyperlinks
+                        for match in self._CITE_RE.finditer(pending):
+                            linked.write(pending[position:match.start()])
+                            linked.write(f"[[{match.group(1)}]]({source_urls.get(int(match.group(1)), '#')})")
+                            position = match.end()
+
+                        # Hold back a trailing "[SRC..." that may still become a citation
+                        held = self._CITE_PREFIX_RE.search(pending, position)
+                        cut = held.start() if held else len(pending)
+                        linked.write(pending[position:cut])
+                        pending = pending[cut:]
+
+                    yield linked.getvalue() + pending, steps.copy()
@@ -1,11 +1,18 @@
 import gradio as gr
 from dotenv import load_dotenv
 from dewey import Dewey
-from models import AzureSearchConfig, AzureOpenAIConfig
+from models import AzureSearchConfig, AzureOpenAIConfig, DEFAULT_EMBEDDING_DIMENSIONS
 import os
 import uuid
 import json
 
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    # uvloop is not available on Windows, keep the default event loop
+    pass
+
 load_dotenv()
 
 
@@ -15,19 +22,21 @@ oai_config = AzureOpenAIConfig(
     embedding_deployment=os.environ["EMBEDDING_DEPLOYMENT_NAME"],
     embedding_model=os.environ["EMBEDDING_MODEL_NAME"],
     chat_deployment=os.environ["CHATGPT_DEPLOYMENT_NAME"],
-    chat_model=os.environ["CHATGPT_MODEL_NAME"]
+    chat_model=os.environ["CHATGPT_MODEL_NAME"],
+    embedding_dimensions=int(os.getenv("EMBEDDING_DIMENSIONS") or DEFAULT_EMBEDDING_DIMENSIONS)
 )
 
 search_config = AzureSearchConfig(
     service_endpoint=os.environ["AZURE_SEARCH_ENDPOINT"],
     index_name=os.environ["AZURE_SEARCH_INDEX_NAME"],
-    key=os.environ["AZURE_SEARCH_API_KEY"]
+    key=os.environ["AZURE_SEARCH_API_KEY"],
+    vector_k=int(os.getenv("AZURE_SEARCH_VECTOR_K") or 20)
 )
 
 dewey = Dewey(oai_config, search_config)
 
 
-def chat_with_dewey(message, history, session_state):
+async def chat_with_dewey(message, history, session_state):
     # Initialize session if needed
     if session_state["session_id"] is None:
         session_state["session_id"] = str(uuid.uuid4())
@@ -43,8 +52,9 @@ def chat_with_dewey(message, history, session_state):
     
     # Stream the response from Dewey
     history_length = len(history)
-    for response, steps in dewey.process(message, history[:-1]):
-        history = history[:history_length]
+    async for response, steps in dewey.process(message, history[:-1]):
+        # Drop the previous partial reply in place instead of copying the history
+        del history[history_length:]
         for step in steps:
             history.append({
                 "role": "assistant",
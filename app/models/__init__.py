@@ -1,4 +1,4 @@
 from .retrieve import SearchParams, DateRange
-from .core import AzureSearchConfig, AzureOpenAIConfig
+from .core import AzureSearchConfig, AzureOpenAIConfig, DEFAULT_EMBEDDING_DIMENSIONS
 
-__all__ = ["SearchParams", "DateRange", "AzureSearchConfig", "OpenAIConfig"]
\ No newline at end of file
+__all__ = ["SearchParams", "DateRange", "AzureSearchConfig", "OpenAIConfig", "DEFAULT_EMBEDDING_DIMENSIONS"]
\ No newline at end of file
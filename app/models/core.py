@@ -1,7 +1,11 @@
 from dataclasses import dataclass
 
+# Vector size of the index when EMBEDDING_DIMENSIONS is not set, the same
+# default as EmbeddingService.DIMENSIONS in setup
+DEFAULT_EMBEDDING_DIMENSIONS = 1536
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class AzureOpenAIConfig:
     endpoint: str
     api_key: str
@@ -9,8 +13,9 @@ class AzureOpenAIConfig:
     embedding_model: str
     chat_deployment: str  
     chat_model: str
+    embedding_dimensions: int = DEFAULT_EMBEDDING_DIMENSIONS
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AzureSearchConfig:
     """
     Azure Config Helper.
@@ -20,7 +25,9 @@ class AzureSearchConfig:
 
     index_name: str
     key: str
+    vector_k: int
     """
     service_endpoint: str
     index_name: str
-    key: str
\ No newline at end of file
+    key: str
+    vector_k: int = 20
\ No newline at end of file
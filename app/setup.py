@@ -1,6 +1,6 @@
 import asyncio
-import json
 import os
+import orjson
 from pathlib import Path
 from typing import Dict, Any, List
 import sys
@@ -19,7 +19,13 @@ class ConfigurationError(Exception):
 class SetupManager:
     """Professional setup manager for Azure AI Search integration."""
     
-    def __init__(self):
+    # Fields every document must provide with a non-empty value
+    REQUIRED_FIELDS = ('headline', 'content', 'url', 'authors', 'publish_date')
+    # Maximum number of blob uploads in flight at once
+    UPLOAD_CONCURRENCY = 16
+    
+    def __init__(self, upload_concurrency: int = UPLOAD_CONCURRENCY):
+        self.upload_concurrency = upload_concurrency
         self.data_folder = Path(__file__).parent.parent / "data"
         self.env_file = Path(__file__).parent.parent / ".env"
         
@@ -58,6 +64,15 @@ class SetupManager:
                 f"\n\nPlease update your .env file at: {self.env_file}"
             )
             raise ConfigurationError(error_msg)
+
+        # Optional settings
+        if dimensions := os.getenv('EMBEDDING_DIMENSIONS', '').strip():
+            if not dimensions.isdigit() or int(dimensions) == 0:
+                raise ConfigurationError(
+                    f"EMBEDDING_DIMENSIONS must be a positive integer, got '{dimensions}'"
+                    f"\n\nPlease update your .env file at: {self.env_file}"
+                )
+            config['EMBEDDING_DIMENSIONS'] = dimensions
             
         return config
         
@@ -80,29 +95,41 @@ class SetupManager:
             
         return json_files
         
-    def load_documents(self, json_files: List[Path]) -> List[Dict[str, Any]]:
-        """Load and validate JSON documents."""
+    @staticmethod
+    def _read_json(file_path: Path) -> Any:
+        with open(file_path, 'rb') as f:
+            return orjson.loads(f.read())
+
+    async def load_documents(self, json_files: List[Path]) -> List[Dict[str, Any]]:
+        """Load and validate JSON documents, reading and parsing files in parallel threads."""
         documents = []
-        required_fields = ['headline', 'content', 'url', 'authors', 'publish_date']
+        required_fields = self.REQUIRED_FIELDS
+
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._read_json, file_path) for file_path in json_files),
+            return_exceptions=True
+        )
         
-        for file_path in json_files:
+        for file_path, data in zip(json_files, results):
+            if isinstance(data, Exception):
+                print(f"❌ Error loading {file_path.name}: {data}")
+                continue
+
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
                 file_documents = data if isinstance(data, list) else [data]
                 
+                valid_count = 0
                 for i, doc in enumerate(file_documents):
-                    # Validate required fields
-                    missing_fields = [field for field in required_fields if field not in doc or not doc[field]]
-                    
-                    if missing_fields:
+                    # Validate required fields, only listing them for documents that fail
+                    if not all(field in doc and doc[field] for field in required_fields):
+                        missing_fields = [field for field in required_fields if field not in doc or not doc[field]]
                         print(f"⚠️  Skipping document {i} in {file_path.name}: missing required fields: {', '.join(missing_fields)}")
                         continue
                         
                     documents.append(doc)
+                    valid_count += 1
                     
-                print(f"✅ Loaded {len([doc for doc in file_documents if all(field in doc and doc[field] for field in required_fields)])} valid document(s) from {file_path.name}")
+                print(f"✅ Loaded {valid_count} valid document(s) from {file_path.name}")
                 
             except Exception as e:
                 print(f"❌ Error loading {file_path.name}: {e}")
@@ -130,7 +157,8 @@ class SetupManager:
             search_info, 
             embeddings, 
             config['AZURE_STORAGE_CONNECTION_STRING'],
-            config['AZURE_STORAGE_CONTAINER_NAME']
+            config['AZURE_STORAGE_CONTAINER_NAME'],
+            target_dimensions=int(config['EMBEDDING_DIMENSIONS']) if 'EMBEDDING_DIMENSIONS' in config else None
         )
         
         print("🔧 Creating Azure AI Search index...")
@@ -162,23 +190,29 @@ class SetupManager:
                     # Container already exists
                     pass
                 
-                success_count = 0
-                for i, doc in enumerate(documents):
-                    try:
-                        # Create a JSON document for the blob
-                        blob_name = f"doc_{doc.get('id', i)}.json"
-                        blob_data = json.dumps(doc, ensure_ascii=False, indent=2)
-                        
-                        # Upload to blob storage
-                        blob_client = blob_service_client.get_blob_client(
-                            container=container_name, 
-                            blob=blob_name
-                        )
-                        await blob_client.upload_blob(blob_data, overwrite=True)
-                        success_count += 1
-                        
-                    except Exception as e:
-                        print(f"❌ Error uploading document {i}: {e}")
+                semaphore = asyncio.Semaphore(self.upload_concurrency)
+
+                async def upload_document(i: int, doc: Dict[str, Any]) -> bool:
+                    async with semaphore:
+                        try:
+                            # Create a JSON document for the blob
+                            blob_name = f"doc_{doc.get('id', i)}.json"
+                            blob_data = orjson.dumps(doc)
+
+                            # Upload to blob storage
+                            blob_client = blob_service_client.get_blob_client(
+                                container=container_name,
+                                blob=blob_name
+                            )
+                            await blob_client.upload_blob(blob_data, overwrite=True)
+                            return True
+
+                        except Exception as e:
+                            print(f"❌ Error uploading document {i}: {e}")
+                            return False
+
+                results = await asyncio.gather(*(upload_document(i, doc) for i, doc in enumerate(documents)))
+                success_count = sum(results)
                 
                 print(f"✅ Successfully uploaded {success_count} document(s) to blob storage")
                 
@@ -226,7 +260,7 @@ class SetupManager:
             
             if json_files:
                 print("\n📄 Loading documents...")
-                documents = self.load_documents(json_files)
+                documents = await self.load_documents(json_files)
                 
             # Set up Azure resources
             print("\n🚀 Setting up Azure AI Search resources...")
@@ -267,4 +301,10 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        # uvloop is not available on Windows, keep the default event loop
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
@@ -1,4 +1,6 @@
+import asyncio
 import logging
+from functools import lru_cache
 from typing import List, Optional
 
 from azure.search.documents.indexes.models import (
@@ -8,7 +10,6 @@ from azure.search.documents.indexes.models import (
     HnswParameters,
     SearchableField,
     SearchField,
-    SearchFieldDataType,
     SearchIndex,
     SemanticConfiguration,
     SemanticField,
@@ -16,6 +17,10 @@ from azure.search.documents.indexes.models import (
     SemanticSearch,
     SimpleField,
     SplitSkill,
+    ScalarQuantizationCompression,
+    BinaryQuantizationCompression,
+    ScalarQuantizationParameters,
+    VectorSearchCompressionTarget,
     InputFieldMappingEntry,
     OutputFieldMappingEntry,
     VectorSearch,
@@ -33,7 +38,8 @@ from azure.search.documents.indexes.models import (
     FieldMapping,
 )
 
-from azure.search.documents.indexes.aio import SearchIndexerClient
+from azure.core.exceptions import ResourceNotFoundError
+from azure.search.documents.indexes.aio import SearchIndexClient, SearchIndexerClient
 from .search_service import SearchInfo
 from .embedding_service import EmbeddingService
 
@@ -41,6 +47,101 @@ from .embedding_service import EmbeddingService
 logger = logging.getLogger("scripts")
 
 
+@lru_cache(maxsize=8)
+def _build_index_fields(embedding_dimensions: int) -> tuple:
+    # The schema only varies with the vector size, so the field models are built
+    # once per size and shared by every index created after that. The tuple
+    # can't grow or shrink but the models in it can change, don't modify them
+    return (
+        SearchField(
+            name="chunk_id", 
+            type="Edm.String", 
+            key=True,
+            filterable=True,
+            sortable=True,
+            facetable=True,
+            analyzer_name="keyword",
+        ),
+        SearchableField(
+            name="content",
+            type="Edm.String",
+            analyzer_name="standard.lucene",
+        ),
+        SearchableField(
+            name="headline",
+            type="Edm.String",
+            analyzer_name="standard.lucene",
+        ),
+        SearchField(
+            name="content_vector",
+            type="Collection(Edm.Half)",
+            # Only used for vector search, never returned in results,
+            # so no retrievable copy of the vectors is kept
+            hidden=True,
+            stored=False,
+            searchable=True,
+            filterable=False,
+            sortable=False,
+            facetable=False,
+            vector_search_dimensions=embedding_dimensions,
+            vector_search_profile_name="embedding_config",
+        ),
+        SimpleField(
+            name="url",
+            type="Edm.String",
+        ),
+        SimpleField(
+            name="authors",
+            type="Collection(Edm.String)",
+            filterable=True,
+            facetable=True,
+            retrievable=True,
+        ),
+        SimpleField(
+            name="publish_date",
+            type="Edm.DateTimeOffset",
+            filterable=True,
+            sortable=True,
+            facetable=True,
+            retrievable=True,
+            searchable=False
+        ),
+        # sourcepage and parent_id are bookkeeping for the indexer and
+        # never read by Dewey, so they're left out of search results
+        SimpleField(
+            name="sourcepage",
+            type="Edm.String",
+            filterable=True,
+            facetable=True,
+            hidden=True,
+        ),
+        SearchableField(
+            name="parent_id", 
+            type="Edm.String",
+            analyzer_name="standard.lucene",
+            filterable=True,
+            sortable=False,
+            facetable=False,
+            hidden=True,
+        )
+    )
+
+
+# Semantic ranking setup shared by every index, read-only
+_SEMANTIC_SEARCH = SemanticSearch(
+    configurations=[
+        SemanticConfiguration(
+            name="default",
+            prioritized_fields=SemanticPrioritizedFields(
+                title_field=SemanticField(field_name="headline"), 
+                content_fields=[SemanticField(field_name="content")],
+                keywords_fields=[SemanticField(field_name="content")],
+            ),
+        )
+    ]
+)
+
+
 class SearchManager:
     """
     Class to manage a search service. It can create indexes, and update or remove sections stored in these indexes
@@ -53,88 +154,50 @@ class SearchManager:
         embeddings: EmbeddingService,
         blob_connection_string: str,
         blob_container_name: str,
+        use_binary_quantization: bool = False,
+        target_dimensions: Optional[int] = None,
+        hnsw_m: int = 10,
+        hnsw_ef_construction: int = 400,
+        hnsw_ef_search: int = 100,
+        chunk_size: int = 512,
+        chunk_overlap: int = 48,
+        indexer_batch_size: int = 100,
     ):
         self.search_info = search_info
         self.embeddings = embeddings
-        self.embedding_dimensions = self.embeddings.DIMENSIONS
+        # text-embedding-3 models can be shortened (Matryoshka truncation) to
+        # fewer dimensions, which shrinks the index and speeds up vector search
+        self.embedding_dimensions = target_dimensions or self.embeddings.DIMENSIONS
         self.blob_connection_string = blob_connection_string
         self.blob_container_name = blob_container_name
+        # Binary quantization trades a little more recall than int8 for a much smaller index
+        self.use_binary_quantization = use_binary_quantization
+        # HNSW graph degree and beam widths. Azure AI Search accepts m in [4, 10]
+        # and ef_construction / ef_search in [100, 1000]
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        # Chunk length and overlap in tokens. Overlapping tokens are embedded
+        # and stored twice, so the overlap is kept small
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.indexer_batch_size = indexer_batch_size
+
+    async def _index_exists(self, search_index_client: SearchIndexClient) -> bool:
+        # Look up the one index directly rather than listing every index in the service
+        try:
+            await search_index_client.get_index(self.search_info.index_name)
+        except ResourceNotFoundError:
+            return False
+        return True
 
     async def create_index(self, vectorizers: Optional[List[VectorSearchVectorizer]] = None):
         logger.info("Checking whether search index %s exists...", self.search_info.index_name)
 
         async with self.search_info.create_search_index_client() as search_index_client:
 
-            if self.search_info.index_name not in [name async for name in search_index_client.list_index_names()]:
+            if not await self._index_exists(search_index_client):
                 logger.info("Creating new search index %s", self.search_info.index_name)
-                fields = [
-                    SearchField(
-                        name="chunk_id", 
-                        type="Edm.String", 
-                        key=True,
-                        filterable=True,
-                        sortable=True,
-                        facetable=True,
-                        analyzer_name="keyword",
-                    ),
-                    SearchableField(
-                        name="content",
-                        type="Edm.String",
-                        analyzer_name="standard.lucene",
-                    ),
-                    SearchableField(
-                        name="headline",
-                        type="Edm.String",
-                        analyzer_name="standard.lucene",
-                    ),
-                    SearchField(
-                        name="content_vector",
-                        type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
-                        hidden=False,
-                        searchable=True,
-                        filterable=False,
-                        sortable=False,
-                        facetable=False,
-                        vector_search_dimensions=self.embedding_dimensions,
-                        vector_search_profile_name="embedding_config",
-                    ),
-                    SimpleField(
-                        name="url",
-                        type="Edm.String",
-                    ),
-                    SimpleField(
-                        name="authors",
-                        type="Collection(Edm.String)",
-                        filterable=True,
-                        facetable=True,
-                        retrievable=True,
-                    ),
-                    SimpleField(
-                        name="publish_date",
-                        type="Edm.DateTimeOffset",
-                        filterable=True,
-                        sortable=True,
-                        facetable=True,
-                        retrievable=True,
-                        searchable=False
-                    ),
-                    SimpleField(
-                        name="sourcepage",
-                        type="Edm.String",
-                        filterable=True,
-                        facetable=True,
-                    ),
-                    SearchableField(
-                        name="parent_id", 
-                        type="Edm.String",
-                        analyzer_name="standard.lucene",
-                        filterable=True,
-                        sortable=False,
-                        facetable=False,
-                        retrievable=True,
-                    )
-                ]
-
                 vectorizers = [
                     AzureOpenAIVectorizer(
                         vectorizer_name=f"{self.search_info.index_name}-vectorizer",
@@ -148,24 +211,19 @@ class SearchManager:
 
                 index = SearchIndex(
                     name=self.search_info.index_name,
-                    fields=fields,
-                    semantic_search=SemanticSearch(
-                        configurations=[
-                            SemanticConfiguration(
-                                name="default",
-                                prioritized_fields=SemanticPrioritizedFields(
-                                    title_field=SemanticField(field_name="headline"), 
-                                    content_fields=[SemanticField(field_name="content")],
-                                    keywords_fields=[SemanticField(field_name="content")],
-                                ),
-                            )
-                        ]
-                    ),
+                    fields=list(_build_index_fields(self.embedding_dimensions)),
+                    semantic_search=_SEMANTIC_SEARCH,
                     vector_search=VectorSearch(
                         algorithms=[
                             HnswAlgorithmConfiguration(
                                 name="hnsw_config",
-                                parameters=HnswParameters(metric="cosine"),
+                                parameters=HnswParameters(
+                                    # OpenAI embeddings are unit length, so dot product ranks like cosine
+                                    metric="dotProduct",
+                                    m=self.hnsw_m,
+                                    ef_construction=self.hnsw_ef_construction,
+                                    ef_search=self.hnsw_ef_search,
+                                ),
                             )
                         ],
                         profiles=[
@@ -175,9 +233,29 @@ class SearchManager:
                                 vectorizer_name=(
                                     f"{self.search_info.index_name}-vectorizer"
                                 ),
+                                compression_name="bq" if self.use_binary_quantization else "sq8",
                             ),
                         ],
                         vectorizers=vectorizers,
+                        compressions=[
+                            # int8 vectors in the graph, with candidates
+                            # rescored against the original vectors
+                            ScalarQuantizationCompression(
+                                compression_name="sq8",
+                                rerank_with_original_vectors=True,
+                                default_oversampling=4,
+                                parameters=ScalarQuantizationParameters(
+                                    quantized_data_type=VectorSearchCompressionTarget.INT8
+                                ),
+                            ),
+                            # One bit per dimension, compared by Hamming distance,
+                            # with heavier oversampling to make up for the lost recall
+                            BinaryQuantizationCompression(
+                                compression_name="bq",
+                                rerank_with_original_vectors=True,
+                                default_oversampling=10,
+                            ),
+                        ],
                     ),
                 )
 
@@ -204,8 +282,8 @@ class SearchManager:
             description="Split skill to chunk documents",
             text_split_mode="pages",
             context="/document",
-            maximum_page_length=512,
-            page_overlap_length=96,
+            maximum_page_length=self.chunk_size,
+            page_overlap_length=self.chunk_overlap,
             maximum_pages_to_take=0,
             unit="azureOpenAITokens",
             inputs=[
@@ -223,7 +301,7 @@ class SearchManager:
             resource_url=self.embeddings.endpoint,
             deployment_name=self.embeddings.deployment,
             model_name=self.embeddings.model_name,
-            dimensions=self.embeddings.DIMENSIONS,
+            dimensions=self.embedding_dimensions,
             inputs=[
                 InputFieldMappingEntry(name="text", source="/document/pages/*"),
             ],
@@ -281,6 +359,12 @@ class SearchManager:
                 FieldMapping(source_field_name="publish_date", target_field_name="publish_date"),
             ],
             parameters={
+                # Larger batches mean fewer round trips to the index
+                "batchSize": self.indexer_batch_size,
+                # Skip documents that fail instead of stopping the run, but stop
+                # once more than 10 documents in one batch fail
+                "maxFailedItems": -1,
+                "maxFailedItemsPerBatch": 10,
                 "configuration": {
                     "parsingMode": "json",
                     "dataToExtract": "contentAndMetadata"
@@ -290,23 +374,27 @@ class SearchManager:
         
         return indexer, indexer_name
 
-    async def setup(self):
-        ds_client = SearchIndexerClient(endpoint=self.search_info.endpoint, credential=self.search_info.credential)
+    async def setup(self, ds_client: Optional[SearchIndexerClient] = None):
+        # Callers that set up several indexes can pass in one client and keep
+        # its connections; otherwise open one just for this call and close it
+        if ds_client is None:
+            async with self.search_info.create_search_indexer_client() as ds_client:
+                return await self.setup(ds_client)
 
-        # Create blob data source
+        # Build the data source and skillset definitions
         data_source, data_source_name = await self.create_blob_data_source()
-        await ds_client.create_or_update_data_source_connection(data_source)
-
-        # Create skillset
         embedding_skillset = await self.create_index_skills()
-        await ds_client.create_or_update_skillset(embedding_skillset)
 
-        # Create indexer
+        # The data source and skillset don't depend on each other, create them together
+        await asyncio.gather(
+            ds_client.create_or_update_data_source_connection(data_source),
+            ds_client.create_or_update_skillset(embedding_skillset),
+        )
+
+        # Create indexer, which references both
         indexer, indexer_name = await self.create_indexer(embedding_skillset.name, data_source_name)
         await ds_client.create_or_update_indexer(indexer)
 
-        await ds_client.close()
-
         return indexer_name
 
 